@@ -1,14 +1,59 @@
 import os
+import re
 from datetime import datetime
 from typing import Optional, Literal, List, Any, Dict
-from fastapi import FastAPI, HTTPException, Body, Query
+from fastapi import FastAPI, HTTPException, Body, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, EmailStr
 from bson import ObjectId
-
-from database import db, create_document, get_documents
-
-app = FastAPI(title="ResqFood API")
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from database import db, redis_client, create_document, get_documents
+
+app = FastAPI(title="ResqFood API", default_response_class=ORJSONResponse)
+
+
+@app.on_event("startup")
+async def ensure_indexes():
+    # Index the hot lookups so they IXSCAN instead of scanning the whole
+    # collection. The unique email index also makes duplicate registration
+    # a storage-layer guarantee instead of a racy read-then-insert.
+    if db is None:
+        return
+    await db["user"].create_index([("email", 1)], unique=True)
+    await db["donation"].create_index([("status", 1)])
+    await db["donation"].create_index([("status", 1), ("created_at", -1)])
+    await db["donation"].create_index([("restaurant_id", 1), ("created_at", -1)])
+    await db["donation"].create_index([("updated_at", -1)])
+    # Single-field indexes that serve the case-sensitive anchored prefix
+    # regexes in match=prefix search as bounded index scans.
+    await db["donation"].create_index([("food_item", 1)])
+    await db["donation"].create_index([("restaurant_name", 1)])
+    await db["donation"].create_index([("pickup_address", 1)])
+    await db["donation"].create_index(
+        [("food_item", "text"), ("restaurant_name", "text"), ("pickup_address", "text")],
+        name="donation_text_idx",
+    )
+    # Seed the denormalized donation counters from the collection if they
+    # don't exist yet (first boot or pre-existing data).
+    if await db["stats"].find_one({"_id": "global"}, {"_id": 1}) is None:
+        facet = (await db["donation"].aggregate([{"$facet": {
+            "total": [{"$count": "n"}],
+            "by_status": [{"$group": {"_id": "$status", "n": {"$sum": 1}}}],
+        }}]).to_list(None))[0]
+        status_counts = {row["_id"]: row["n"] for row in facet["by_status"]}
+        await db["stats"].update_one(
+            {"_id": "global"},
+            {"$setOnInsert": {
+                "donations": facet["total"][0]["n"] if facet["total"] else 0,
+                "available": status_counts.get("available", 0),
+                "claimed": status_counts.get("claimed", 0),
+                "delivered": status_counts.get("delivered", 0),
+            }},
+            upsert=True,
+        )
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,7 +67,16 @@ app.add_middleware(
 # Utility helpers
 ############################
 
+_OID_RE = re.compile(r"^[0-9a-fA-F]{24}$")
+
+
 def oid(id_str: str) -> ObjectId:
+    # Cheap regex precheck instead of letting ObjectId raise: malformed
+    # ids skip the exception machinery, valid ones skip the validation
+    # work inside the constructor. fullmatch, not match — "$" would also
+    # accept a trailing newline that ObjectId then rejects.
+    if not _OID_RE.fullmatch(id_str):
+        raise HTTPException(status_code=400, detail="Invalid ID")
     try:
         return ObjectId(id_str)
     except Exception:
@@ -32,16 +86,73 @@ def oid(id_str: str) -> ObjectId:
 def serialize_doc(doc: Dict[str, Any]):
     if not doc:
         return doc
-    doc = dict(doc)
+    # One pass: build the output without _id, then append the string id.
+    # Datetimes are left as-is; orjson serializes them natively.
+    out = {k: v for k, v in doc.items() if k != "_id"}
     _id = doc.get("_id")
     if isinstance(_id, ObjectId):
-        doc["id"] = str(_id)
-        del doc["_id"]
-    # Convert datetimes to iso
-    for k, v in list(doc.items()):
-        if isinstance(v, datetime):
-            doc[k] = v.isoformat()
-    return doc
+        out["id"] = str(_id)
+    return out
+
+
+############################
+# Cache helpers (cache-aside with Redis, no-ops when Redis is not configured)
+############################
+import orjson
+
+LIST_CACHE_TTL = 10
+OVERVIEW_CACHE_TTL = 30
+OVERVIEW_CACHE_KEY = "don:overview"
+
+
+async def cache_get_raw(key: str):
+    if redis_client is None:
+        return None
+    try:
+        return await redis_client.get(key)
+    except Exception:
+        return None
+
+
+async def cache_set_raw(key: str, blob, ttl: int):
+    if redis_client is None:
+        return
+    try:
+        await redis_client.set(key, blob, ex=ttl)
+    except Exception:
+        pass
+
+
+async def cache_get(key: str):
+    raw = await cache_get_raw(key)
+    return orjson.loads(raw) if raw else None
+
+
+async def cache_set(key: str, value: Any, ttl: int):
+    await cache_set_raw(key, orjson.dumps(value), ttl)
+
+
+async def bump_donation_stats(deltas: Dict[str, int]):
+    """Apply counter deltas to the global stats doc on a state change.
+
+    Also bumps a monotonic write counter that feeds the listing ETag, so
+    writes that don't move max(updated_at) — deletes — still change it.
+    """
+    await db["stats"].update_one(
+        {"_id": "global"}, {"$inc": {**deltas, "writes": 1}}, upsert=True
+    )
+
+
+async def invalidate_donation_cache():
+    """Drop cached donation listings and the overview after any write."""
+    if redis_client is None:
+        return
+    try:
+        keys = [k async for k in redis_client.scan_iter("don:list:*")]
+        keys.append(OVERVIEW_CACHE_KEY)
+        await redis_client.delete(*keys)
+    except Exception:
+        pass
 
 
 ############################
@@ -85,8 +196,19 @@ class DeliverRequest(BaseModel):
 # Simple hashing (SHA256) for demo
 ############################
 import hashlib
+import warnings
+from functools import lru_cache
 
+# hashlib.sha256 should bind to OpenSSL's implementation, which picks the
+# CPU's SHA extensions at runtime; the pure-Python fallback is far slower.
+if getattr(hashlib.sha256, "__name__", "") != "openssl_sha256":
+    warnings.warn("hashlib.sha256 is not OpenSSL-backed; password hashing will be slow")
+
+
+@lru_cache(maxsize=4096)
 def hash_password(pw: str) -> str:
+    # Cache key is the plaintext and the cache is process-local; fine for
+    # this demo. For production use bcrypt/argon2 and do not cache.
     return hashlib.sha256(pw.encode("utf-8")).hexdigest()
 
 
@@ -99,7 +221,7 @@ def read_root():
 
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -113,7 +235,7 @@ def test_database():
             response["database"] = "✅ Available"
             response["connection_status"] = "Connected"
             try:
-                collections = db.list_collection_names()
+                collections = await db.list_collection_names()
                 response["collections"] = collections
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
@@ -127,11 +249,7 @@ def test_database():
 # Auth
 ############################
 @app.post("/auth/register")
-def register(req: RegisterRequest):
-    # Check if email exists
-    existing = db["user"].find_one({"email": req.email})
-    if existing:
-        raise HTTPException(status_code=400, detail="Email already registered")
+async def register(req: RegisterRequest):
     user_doc = {
         "name": req.name,
         "email": req.email,
@@ -142,7 +260,10 @@ def register(req: RegisterRequest):
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow(),
     }
-    result = db["user"].insert_one(user_doc)
+    try:
+        result = await db["user"].insert_one(user_doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
     user_doc["id"] = str(result.inserted_id)
     del user_doc["password_hash"]
     user_doc.pop("_id", None)
@@ -150,8 +271,14 @@ def register(req: RegisterRequest):
 
 
 @app.post("/auth/login")
-def login(req: LoginRequest):
-    user = db["user"].find_one({"email": req.email})
+async def login(req: LoginRequest):
+    user = await db["user"].find_one(
+        {"email": req.email},
+        projection={
+            "password_hash": 1, "name": 1, "email": 1, "role": 1,
+            "address": 1, "is_active": 1, "created_at": 1, "updated_at": 1,
+        },
+    )
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     if user.get("password_hash") != hash_password(req.password):
@@ -165,9 +292,9 @@ def login(req: LoginRequest):
 # Donations
 ############################
 @app.post("/donations")
-def create_donation(req: DonationCreateRequest):
+async def create_donation(req: DonationCreateRequest):
     # Ensure restaurant exists and role matches
-    restaurant = db["user"].find_one({"_id": oid(req.restaurant_id)})
+    restaurant = await db["user"].find_one({"_id": oid(req.restaurant_id)})
     if not restaurant or restaurant.get("role") != "restaurant":
         raise HTTPException(status_code=400, detail="Invalid restaurant user")
 
@@ -184,19 +311,90 @@ def create_donation(req: DonationCreateRequest):
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow(),
     }
-    result = db["donation"].insert_one(donation)
+    result = await db["donation"].insert_one(donation)
     donation["id"] = str(result.inserted_id)
     donation.pop("_id", None)
+    await bump_donation_stats({"donations": 1, "available": 1})
+    await invalidate_donation_cache()
     return donation
 
 
+@app.post("/donations/bulk")
+async def create_donations_bulk(reqs: List[DonationCreateRequest]):
+    if not reqs:
+        raise HTTPException(status_code=400, detail="No donations provided")
+
+    # Validate all referenced restaurants in one query instead of one
+    # lookup per donation. Compare canonical (lowercase) id strings:
+    # ObjectId accepts uppercase hex but str(ObjectId) is lowercase.
+    restaurant_oids = {str(oid(r.restaurant_id)) for r in reqs}
+    found = await db["user"].find(
+        {"_id": {"$in": [ObjectId(rid) for rid in restaurant_oids]}, "role": "restaurant"},
+        {"_id": 1},
+    ).to_list(None)
+    valid_ids = {str(d["_id"]) for d in found}
+    if restaurant_oids - valid_ids:
+        raise HTTPException(status_code=400, detail="Invalid restaurant user")
+
+    now = datetime.utcnow()
+    docs = [{
+        "food_item": r.food_item,
+        "quantity": r.quantity,
+        "pickup_address": r.pickup_address,
+        "expiry_time": r.expiry_time,
+        "restaurant_id": r.restaurant_id,
+        "restaurant_name": r.restaurant_name,
+        "status": "available",
+        "claimed_by": None,
+        "claimed_by_id": None,
+        "created_at": now,
+        "updated_at": now,
+    } for r in reqs]
+    # One unordered insert_many amortizes network and journal cost
+    # across the whole batch.
+    await db["donation"].insert_many(docs, ordered=False)
+    await bump_donation_stats({"donations": len(docs), "available": len(docs)})
+    await invalidate_donation_cache()
+    return [serialize_doc(d) for d in docs]
+
+
 @app.get("/donations")
-def list_donations(
+async def list_donations(
+    request: Request,
     status: Optional[Literal['available', 'claimed', 'delivered']] = Query(None),
     restaurant_id: Optional[str] = Query(None),
     exclude_claimed: Optional[bool] = Query(False),
-    search: Optional[str] = Query(None)
+    search: Optional[str] = Query(None),
+    match: Literal['text', 'prefix'] = Query('text')
 ):
+    # JSON-encode the parameter list so absent values and values
+    # containing the separator can't collide with other filter combos
+    # (the ETag below is seeded from this key too).
+    cache_key = "don:list:" + orjson.dumps(
+        [status, restaurant_id, exclude_claimed, search, match]
+    ).decode()
+
+    # Cheap ETag from the newest updated_at, the stats write counter and
+    # the filter key: pollers whose view hasn't changed get a 304 with no
+    # decode/encode/egress. max(updated_at) alone would miss deletes of
+    # older documents, hence the write counter.
+    latest = await db["donation"].find_one(
+        {}, projection={"updated_at": 1}, sort=[("updated_at", -1)]
+    )
+    stamp = latest["updated_at"].isoformat() if latest else "empty"
+    stats = await db["stats"].find_one({"_id": "global"}, {"writes": 1}) or {}
+    etag = hashlib.sha1(
+        f"{stamp}|{stats.get('writes', 0)}|{cache_key}".encode()
+    ).hexdigest()
+    headers = {"ETag": etag, "Cache-Control": "max-age=5"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    cached = await cache_get_raw(cache_key)
+    if cached is not None:
+        # Cached entries are already-encoded JSON; serve the bytes as-is.
+        return Response(content=cached, media_type="application/json", headers=headers)
+
     filt: Dict[str, Any] = {}
     if status:
         filt["status"] = status
@@ -205,89 +403,158 @@ def list_donations(
     if exclude_claimed:
         filt["status"] = "available"
     if search:
-        filt["$or"] = [
-            {"food_item": {"$regex": search, "$options": "i"}},
-            {"restaurant_name": {"$regex": search, "$options": "i"}},
-            {"pickup_address": {"$regex": search, "$options": "i"}},
-        ]
-
-    docs = db["donation"].find(filt).sort("created_at", -1)
-    return [serialize_doc(d) for d in docs]
+        if match == "prefix":
+            # Escaped and anchored so user input cannot inject regex
+            # syntax, and case-sensitive so MongoDB can bound the scan
+            # with the single-field B-tree indexes (a case-insensitive
+            # regex cannot use an index); case-insensitive matching is
+            # what the text-search default is for.
+            pat = {"$regex": f"^{re.escape(search)}"}
+            filt["$or"] = [
+                {"food_item": pat},
+                {"restaurant_name": pat},
+                {"pickup_address": pat},
+            ]
+        else:
+            # Text index lookup instead of an unanchored case-insensitive
+            # regex, which cannot use an index and scans the collection.
+            filt["$text"] = {"$search": search}
+
+    # Project only the fields the client renders so MongoDB sends less
+    # over the wire and pymongo decodes less BSON.
+    projection = {
+        "food_item": 1, "quantity": 1, "pickup_address": 1, "expiry_time": 1,
+        "restaurant_id": 1, "restaurant_name": 1, "status": 1,
+        "claimed_by": 1, "claimed_by_id": 1, "created_at": 1, "updated_at": 1,
+    }
+    cursor = db["donation"].find(filt, projection).sort("created_at", -1).batch_size(100)
+
+    async def stream():
+        # Encode documents batch by batch so memory stays flat and the
+        # client starts receiving bytes while Mongo is still producing.
+        # The encoded chunks are kept so the full blob can be cached.
+        parts = [b"["]
+        yield b"["
+        first = True
+        async for d in cursor:
+            chunk = orjson.dumps(serialize_doc(d))
+            if not first:
+                parts.append(b",")
+                yield b","
+            first = False
+            parts.append(chunk)
+            yield chunk
+        parts.append(b"]")
+        yield b"]"
+        await cache_set_raw(cache_key, b"".join(parts), LIST_CACHE_TTL)
+
+    return StreamingResponse(stream(), media_type="application/json", headers=headers)
 
 
 @app.patch("/donations/{donation_id}")
-def update_donation(donation_id: str, req: DonationUpdateRequest):
-    updates = {k: v for k, v in req.model_dump().items() if v is not None}
+async def update_donation(donation_id: str, req: DonationUpdateRequest):
+    updates = req.model_dump(exclude_none=True)
     if not updates:
-        return serialize_doc(db["donation"].find_one({"_id": oid(donation_id)}))
+        raise HTTPException(status_code=400, detail="No fields to update")
     updates["updated_at"] = datetime.utcnow()
-    res = db["donation"].update_one({"_id": oid(donation_id)}, {"$set": updates})
-    if res.matched_count == 0:
+    doc = await db["donation"].find_one_and_update(
+        {"_id": oid(donation_id)},
+        {"$set": updates},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is None:
         raise HTTPException(status_code=404, detail="Donation not found")
-    return serialize_doc(db["donation"].find_one({"_id": oid(donation_id)}))
+    await invalidate_donation_cache()
+    return serialize_doc(doc)
 
 
 @app.delete("/donations/{donation_id}")
-def delete_donation(donation_id: str):
-    res = db["donation"].delete_one({"_id": oid(donation_id)})
-    if res.deleted_count == 0:
+async def delete_donation(donation_id: str):
+    deleted = await db["donation"].find_one_and_delete(
+        {"_id": oid(donation_id)}, {"status": 1}
+    )
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Donation not found")
+    await bump_donation_stats({"donations": -1, deleted.get("status", "available"): -1})
+    await invalidate_donation_cache()
     return {"success": True}
 
 
 @app.post("/donations/{donation_id}/claim")
-def claim_donation(donation_id: str, req: ClaimRequest):
+async def claim_donation(donation_id: str, req: ClaimRequest):
     # ensure user exists and role is ngo or society
-    user = db["user"].find_one({"_id": oid(req.user_id)})
+    user = await db["user"].find_one({"_id": oid(req.user_id)})
     if not user or user.get("role") not in ("ngo", "society"):
         raise HTTPException(status_code=400, detail="Invalid claimer")
 
-    donation = db["donation"].find_one({"_id": oid(donation_id)})
-    if not donation:
-        raise HTTPException(status_code=404, detail="Donation not found")
-    if donation.get("status") != "available":
-        raise HTTPException(status_code=400, detail="Donation not available")
-
-    db["donation"].update_one(
-        {"_id": oid(donation_id)},
+    # Atomic check-and-claim: the status precondition in the filter means
+    # two concurrent claimers cannot both succeed, and the update returns
+    # the new document in the same round-trip.
+    updated = await db["donation"].find_one_and_update(
+        {"_id": oid(donation_id), "status": "available"},
         {"$set": {
             "status": "claimed",
             "claimed_by": f"{req.role.capitalize()}: {req.user_name}",
             "claimed_by_id": req.user_id,
             "updated_at": datetime.utcnow()
-        }}
+        }},
+        return_document=ReturnDocument.AFTER,
     )
-    return serialize_doc(db["donation"].find_one({"_id": oid(donation_id)}))
+    if updated is None:
+        donation = await db["donation"].find_one({"_id": oid(donation_id)}, {"status": 1})
+        if not donation:
+            raise HTTPException(status_code=404, detail="Donation not found")
+        raise HTTPException(status_code=400, detail="Donation not available")
+    await bump_donation_stats({"available": -1, "claimed": 1})
+    await invalidate_donation_cache()
+    return serialize_doc(updated)
 
 
 @app.post("/donations/{donation_id}/deliver")
-def mark_delivered(donation_id: str, _req: DeliverRequest):
-    donation = db["donation"].find_one({"_id": oid(donation_id)})
-    if not donation:
-        raise HTTPException(status_code=404, detail="Donation not found")
-
-    db["donation"].update_one(
-        {"_id": oid(donation_id)},
-        {"$set": {"status": "delivered", "updated_at": datetime.utcnow()}}
+async def mark_delivered(donation_id: str, _req: DeliverRequest):
+    updated = await db["donation"].find_one_and_update(
+        {"_id": oid(donation_id), "status": "claimed"},
+        {"$set": {"status": "delivered", "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
     )
-    return serialize_doc(db["donation"].find_one({"_id": oid(donation_id)}))
+    if updated is None:
+        donation = await db["donation"].find_one({"_id": oid(donation_id)}, {"status": 1})
+        if not donation:
+            raise HTTPException(status_code=404, detail="Donation not found")
+        raise HTTPException(status_code=400, detail="Donation not claimed")
+    await bump_donation_stats({"claimed": -1, "delivered": 1})
+    await invalidate_donation_cache()
+    return serialize_doc(updated)
 
 
 ############################
 # Admin overview
 ############################
 @app.get("/admin/overview")
-def admin_overview():
+async def admin_overview():
+    cached = await cache_get(OVERVIEW_CACHE_KEY)
+    if cached is not None:
+        return cached
+
+    # Donation counts come from the denormalized stats doc maintained on
+    # every state transition, so they stay O(1) as the collection grows.
+    # Role counts still group the (small) user collection.
+    role_rows = await db["user"].aggregate(
+        [{"$group": {"_id": "$role", "n": {"$sum": 1}}}]
+    ).to_list(None)
+    role_counts = {row["_id"]: row["n"] for row in role_rows}
+    stats = await db["stats"].find_one({"_id": "global"}) or {}
     counts = {
-        "restaurants": db["user"].count_documents({"role": "restaurant"}),
-        "ngos": db["user"].count_documents({"role": "ngo"}),
-        "societies": db["user"].count_documents({"role": "society"}),
-        "admins": db["user"].count_documents({"role": "admin"}),
-        "donations": db["donation"].count_documents({}),
-        "available": db["donation"].count_documents({"status": "available"}),
-        "claimed": db["donation"].count_documents({"status": "claimed"}),
-        "delivered": db["donation"].count_documents({"status": "delivered"}),
+        "restaurants": role_counts.get("restaurant", 0),
+        "ngos": role_counts.get("ngo", 0),
+        "societies": role_counts.get("society", 0),
+        "admins": role_counts.get("admin", 0),
+        "donations": stats.get("donations", 0),
+        "available": stats.get("available", 0),
+        "claimed": stats.get("claimed", 0),
+        "delivered": stats.get("delivered", 0),
     }
+    await cache_set(OVERVIEW_CACHE_KEY, counts, OVERVIEW_CACHE_TTL)
     return counts
 
 